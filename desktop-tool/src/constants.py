@@ -218,3 +218,4 @@ DPI_HEIGHT_RATIO = 300 / 1110  # TODO: share this between desktop tool and backe
 
 PROJECT_MAX_SIZE = 612  # shared between target sites
 THREADS = 5  # shared between CardImageCollections
+IMPLICIT_WAIT_SECONDS = 5  # how long the driver waits for elements to appear by default
@@ -10,17 +10,19 @@ from typing import Any, Generator, Optional
 import attr
 import enlighten
 from selenium.common import exceptions as sl_exc
-from selenium.common.exceptions import (
-    NoAlertPresentException,
-    NoSuchElementException,
-    NoSuchWindowException,
-)
+from selenium.common.exceptions import NoAlertPresentException, NoSuchWindowException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.support.expected_conditions import invisibility_of_element
-from selenium.webdriver.support.ui import Select, WebDriverWait
-
-from src.constants import THREADS, Browsers, Cardstocks, States, TargetSites
+from selenium.webdriver.remote.webelement import WebElement
+
+from src.constants import (
+    IMPLICIT_WAIT_SECONDS,
+    THREADS,
+    Browsers,
+    Cardstocks,
+    States,
+    TargetSites,
+)
 from src.exc import InvalidStateException
 from src.order import CardImage, CardImageCollection, CardOrder
 from src.processing import ImagePostProcessingConfig
@@ -31,10 +33,22 @@ from src.utils import (
     log_hours_minutes_seconds_elapsed,
 )
 
+# defines a JavaScript function which determines whether the targeted site's loading circle is visible
+IS_LOADING_JS = """
+function isLoading() {
+    var element = document.getElementById("sysdiv_wait");
+    return (
+        element !== null
+        && element.getClientRects().length > 0
+        && window.getComputedStyle(element).visibility !== "hidden"
+    );
+}
+"""
+
 
 @attr.s
 class AutofillDriver:
-    driver: WebDriver = attr.ib(default=None)  # delay initialisation until XML is selected and parsed
+    driver: WebDriver = attr.ib(default=None)  # delay initialisation until image downloads have begun
     browser: Browsers = attr.ib(default=Browsers.chrome)
     binary_location: Optional[str] = attr.ib(default=None)  # path to browser executable
     target_site: TargetSites = attr.ib(default=TargetSites.MakePlayingCards)
@@ -46,7 +60,10 @@ class AutofillDriver:
     status_bar: enlighten.StatusBar = attr.ib(init=False, default=False)
     download_bar: enlighten.Counter = attr.ib(init=False, default=None)
     upload_bar: enlighten.Counter = attr.ib(init=False, default=None)
-    file_path_to_pid_map: dict[str, str] = {}
+    file_hash_to_pid_map: dict[str, str] = {}
+    # an uploaded image which has not yet been inserted into its slots, as (pid, image)
+    pending_insertion: Optional[tuple[str, CardImage]] = attr.ib(init=False, default=None)
+    upload_input: Optional[WebElement] = attr.ib(init=False, default=None)  # cached between uploads
 
     # region initialisation
 
@@ -54,7 +71,8 @@ class AutofillDriver:
         try:
             driver = self.browser.value(headless=self.headless, binary_location=self.binary_location)
             driver.set_window_size(1200, 900)
-            driver.implicitly_wait(5)
+            driver.implicitly_wait(IMPLICIT_WAIT_SECONDS)
+            driver.set_script_timeout(10 * 60)  # asynchronous scripts may insert an image into many slots
             print(
                 f"Successfully initialised {bold(self.browser.name)} driver "
                 f"targeting {bold(self.target_site.name)}."
@@ -85,6 +103,13 @@ class AutofillDriver:
     def __attrs_post_init__(self) -> None:
         self.configure_bars()
         self.order.print_order_overview()
+
+    def open_target_site(self) -> None:
+        """
+        Launch the browser and navigate to the targeted site.
+        This is deferred until `execute` has begun downloading images so the two can happen concurrently.
+        """
+
         self.initialise_driver()
         self.driver.get(f"{self.target_site.value.starting_url}")
         self.set_state(States.defining_order)
@@ -129,6 +154,18 @@ class AutofillDriver:
         if in_frame:
             self.switch_to_default_content()
 
+    @contextmanager
+    def implicit_wait(self, seconds: float) -> Generator[None, None, None]:
+        """
+        Context manager for temporarily changing how long the driver waits for elements to appear.
+        """
+
+        self.driver.implicitly_wait(seconds)
+        try:
+            yield
+        finally:
+            self.driver.implicitly_wait(IMPLICIT_WAIT_SECONDS)
+
     @alert_handler
     @exception_retry_skip_handler
     def wait(self) -> None:
@@ -136,17 +173,34 @@ class AutofillDriver:
         Wait until the loading circle in the targeted site disappears.
         """
 
-        try:
-            wait_elem = self.driver.find_element(by=By.ID, value="sysdiv_wait")
-            # Wait for the element to become invisible
-            while True:
-                try:
-                    WebDriverWait(self.driver, 100, poll_frequency=0.1).until(invisibility_of_element(wait_elem))
-                except sl_exc.TimeoutException:
-                    continue
-                break
-        except (sl_exc.NoSuchElementException, sl_exc.NoSuchFrameException, sl_exc.WebDriverException):
-            return
+        # Resolve once the element is invisible - a MutationObserver is notified as soon as this happens,
+        # so there's no need to repeatedly poll the element's visibility through the driver
+        while True:
+            try:
+                self.driver.execute_async_script(
+                    IS_LOADING_JS
+                    + """
+                    var callback = arguments[arguments.length - 1];
+                    if (!isLoading()) {
+                        callback();
+                        return;
+                    }
+                    new MutationObserver(function (mutations, observer) {
+                        if (!isLoading()) {
+                            observer.disconnect();
+                            callback();
+                        }
+                    }).observe(
+                        document.documentElement,
+                        {attributes: true, attributeFilter: ["style", "class"], childList: true, subtree: true}
+                    );
+                    """
+                )
+            except sl_exc.TimeoutException:
+                continue
+            except (sl_exc.NoSuchFrameException, sl_exc.WebDriverException):
+                return
+            break
 
     def set_state(self, state: str, action: Optional[str] = None) -> None:
         self.state = state
@@ -169,6 +223,17 @@ class AutofillDriver:
 
         return self.driver.execute_script(f"javascript:{'return ' if return_ else ''}{js}")  # type: ignore
 
+    @alert_handler
+    @exception_retry_skip_handler
+    def execute_async_javascript(self, js: str, *args: Any) -> Any:
+        """
+        Executes the given asynchronous JavaScript in self.driver with `args`.
+        The script is given a callback as its final argument, and completes (returning the callback's argument)
+        once the callback is called.
+        """
+
+        return self.driver.execute_async_script(js, *args)
+
     def wait_until_javascript_object_is_defined(self, function: str) -> None:
         """
         Depending on the order of operations in the targeted site's project editor, some JavaScript functions
@@ -221,15 +286,61 @@ class AutofillDriver:
         self.wait_until_javascript_object_is_defined("oRenderFeature")  # looks weird but it goes
         self.execute_javascript("setMode('ImageText', 1);")
 
-    @exception_retry_skip_handler
-    def is_image_currently_uploading(self) -> bool:
-        self.wait_until_javascript_object_is_defined("oDesignImage.UploadStatus")
-        return self.execute_javascript("oDesignImage.UploadStatus == 'Uploading'", return_=True) is True
+    @alert_handler
+    def set_mode_in_frame(self, same_images: bool, quantity: Optional[int] = None) -> bool:
+        """
+        Sets each card in the current face to use the same or different images (and optionally sets the number of
+        cards to `quantity`) in the dialogue within the frame `sysifm_loginFrame`.
+        The frame is accessed from the parent document once its contents have loaded, which avoids switching
+        the driver into and out of the frame.
+        Returns whether this was successful.
+        """
 
-    @exception_retry_skip_handler
-    def get_element_for_slot_js(self, slot: int) -> str:
-        self.wait_until_javascript_object_is_defined("PageLayout.prototype.getElement3")
-        return f'PageLayout.prototype.getElement3("dnImg", "{slot}")'
+        try:
+            error = self.driver.execute_async_script(
+                """
+                var sameImages = arguments[0], quantity = arguments[1], callback = arguments[arguments.length - 1];
+                // fall back to switching into the frame if its contents don't load promptly
+                var deadline = Date.now() + 5 * 1000;
+                function setMode() {
+                    try {
+                        var frame = document.getElementById("sysifm_loginFrame");
+                        var frameWindow = frame !== null ? frame.contentWindow : null;
+                        var quantityInput = frameWindow !== null
+                            ? frameWindow.document.getElementById("txt_card_number")
+                            : null;
+                        if (
+                            frameWindow === null
+                            || typeof frameWindow.setMode === "undefined"
+                            || (quantity !== null && quantityInput === null)
+                        ) {
+                            if (Date.now() > deadline) {
+                                callback("Timed out waiting for the frame to load");
+                            } else {
+                                setTimeout(setMode, 100);
+                            }
+                            return;
+                        }
+                        if (quantity !== null) {
+                            quantityInput.value = String(quantity);
+                            ["input", "keyup", "change"].forEach(function (eventType) {
+                                quantityInput.dispatchEvent(new Event(eventType, {bubbles: true}));
+                            });
+                        }
+                        frameWindow.setMode("ImageText", sameImages ? 1 : 0);
+                        callback(null);
+                    } catch (e) {
+                        callback(String(e));
+                    }
+                }
+                setMode();
+                """,
+                same_images,
+                quantity,
+            )
+        except sl_exc.WebDriverException:
+            return False
+        return error is None
 
     @exception_retry_skip_handler
     def get_ssid(self) -> Optional[str]:
@@ -255,10 +366,21 @@ class AutofillDriver:
     # region uploading
 
     @exception_retry_skip_handler
-    def is_slot_filled(self, slot: int) -> bool:
+    def get_pids_in_slots(self, slots: list[int]) -> list[Optional[str]]:
+        """
+        Retrieves the PID of the image in each of `slots` with a single script. Empty slots have a PID of None.
+        """
+
         self.wait_until_javascript_object_is_defined("PageLayout.prototype.checkEmptyImage")
-        return not self.execute_javascript(
-            f"PageLayout.prototype.checkEmptyImage({self.get_element_for_slot_js(slot)})", return_=True
+        return self.driver.execute_script(  # type: ignore
+            """
+            var layout = PageLayout.prototype;
+            return arguments[0].map(function (slot) {
+                var element = layout.getElement3("dnImg", String(slot));
+                return layout.checkEmptyImage(element) ? null : element.getAttribute("pid") || "";
+            });
+            """,
+            slots,
         )
 
     @exception_retry_skip_handler
@@ -272,22 +394,109 @@ class AutofillDriver:
         return len(self.get_all_uploaded_image_pids())
 
     @exception_retry_skip_handler
-    def attempt_to_upload_image(self, image: CardImage) -> None:
+    def wait_for_uploaded_image_pids(self) -> list[str]:
+        """
+        Wait until no image is uploading to the targeted site, then return the PIDs of all uploaded images.
+        The upload status is checked within the browser, so this returns as soon as an upload completes
+        without a round-trip to the browser for each check.
+
+        :raises: If the targeted site does not define `oDesignImage` within 30 seconds
+        """
+
+        while True:
+            try:
+                result = self.driver.execute_async_script(
+                    """
+                    var callback = arguments[arguments.length - 1];
+                    var deadline = Date.now() + 30 * 1000;
+                    (function checkUploadStatus() {
+                        if (typeof oDesignImage === "undefined") {
+                            // the targeted site may not have defined `oDesignImage` yet
+                            if (Date.now() > deadline) {
+                                callback({error: "oDesignImage is not defined"});
+                            } else {
+                                setTimeout(checkUploadStatus, 50);
+                            }
+                        } else if (oDesignImage.UploadStatus == "Uploading") {
+                            setTimeout(checkUploadStatus, 50);
+                        } else {
+                            callback({pids: oDesignImage.dn_getImageList()});
+                        }
+                    })();
+                    """
+                )
+            except sl_exc.TimeoutException:
+                # an image is still uploading
+                continue
+            if result.get("error") is not None:
+                raise sl_exc.JavascriptException(result["error"])
+            pid_string = result.get("pids")
+            return pid_string.split(";") if pid_string else []
+
+    @exception_retry_skip_handler
+    def wait_for_image_upload_to_start(self, previous_number_of_uploaded_images: int) -> None:
+        """
+        Wait up to a second for an upload to begin (or finish) since the targeted site reported
+        `previous_number_of_uploaded_images` uploaded images - small images can finish uploading within that window.
+        """
+
+        self.driver.execute_async_script(
+            """
+            var previousNumberOfUploadedImages = arguments[0], callback = arguments[arguments.length - 1];
+            var deadline = Date.now() + 1000;
+            function hasUploadStarted() {
+                if (typeof oDesignImage === "undefined") {
+                    return false;
+                }
+                var pidString = oDesignImage.dn_getImageList();
+                return (
+                    oDesignImage.UploadStatus == "Uploading"
+                    || (pidString ? pidString.split(";").length : 0) > previousNumberOfUploadedImages
+                );
+            }
+            (function checkUploadStatus() {
+                if (hasUploadStarted() || Date.now() > deadline) {
+                    callback();
+                } else {
+                    setTimeout(checkUploadStatus, 50);
+                }
+            })();
+            """,
+            previous_number_of_uploaded_images,
+        )
+
+    def send_file_to_upload_input(self, file_path: str) -> None:
         """
-        A single attempt at uploading `image` to the targeted site.
+        Sends `file_path` to the targeted site's file upload input.
+        The input element is cached between uploads and only looked up again once it goes stale.
         """
 
-        # an image definitely shouldn't be uploading here, but doesn't hurt to make sure
-        while self.is_image_currently_uploading():
-            time.sleep(0.5)
+        if self.upload_input is not None:
+            try:
+                self.upload_input.send_keys(file_path)
+                return
+            except sl_exc.StaleElementReferenceException:
+                pass
+        self.upload_input = self.driver.find_element(by=By.ID, value="uploadId")
+        self.upload_input.send_keys(file_path)
+
+    @exception_retry_skip_handler
+    def attempt_to_upload_image(self, image: CardImage, previous_number_of_uploaded_images: int) -> list[str]:
+        """
+        A single attempt at uploading `image` to the targeted site, which had `previous_number_of_uploaded_images`
+        uploaded images beforehand.
+        Returns the PIDs of all images uploaded to the targeted site once the attempt has finished.
+        """
 
         # send the image contents to mpc
-        self.driver.find_element(by=By.ID, value="uploadId").send_keys(image.file_path)
-        time.sleep(1)
+        self.send_file_to_upload_input(image.file_path)
+        self.wait_for_image_upload_to_start(previous_number_of_uploaded_images)
+
+        # the targeted site uploads the image in the background, so insert the previous image in the meantime
+        self.insert_pending_image()
 
         # wait for the image to finish uploading
-        while self.is_image_currently_uploading():
-            time.sleep(0.5)
+        return self.wait_for_uploaded_image_pids()
 
     @exception_retry_skip_handler
     def upload_image(self, image: CardImage, max_tries: int = 3) -> Optional[str]:
@@ -296,19 +505,22 @@ class AutofillDriver:
         """
 
         if image.file_path is not None and image.file_exists():
-            if image.file_path in self.file_path_to_pid_map.keys():
-                return self.file_path_to_pid_map[image.file_path]
+            if image.file_hash is not None and image.file_hash in self.file_hash_to_pid_map.keys():
+                # an identical image has already been uploaded
+                return self.file_hash_to_pid_map[image.file_hash]
 
             self.set_state(self.state, f'Uploading "{image.name}"')
-            get_number_of_uploaded_images = self.get_number_of_uploaded_images()
+            # an image definitely shouldn't be uploading here, but doesn't hurt to make sure
+            previous_number_of_uploaded_images = len(self.wait_for_uploaded_image_pids() or [])
 
             tries = 0
             while True:
-                self.attempt_to_upload_image(image)
-                if self.get_number_of_uploaded_images() > get_number_of_uploaded_images:
+                uploaded_image_pids = self.attempt_to_upload_image(image, previous_number_of_uploaded_images) or []
+                if len(uploaded_image_pids) > previous_number_of_uploaded_images:
                     # a new image has been uploaded - assume the last image in the editor is the one we just uploaded
-                    pid = self.get_all_uploaded_image_pids()[-1]
-                    self.file_path_to_pid_map[image.file_path] = pid
+                    pid = uploaded_image_pids[-1]
+                    if image.file_hash is not None:
+                        self.file_hash_to_pid_map[image.file_hash] = pid
                     return pid
                 tries += 1
                 if tries >= max_tries:
@@ -336,14 +548,63 @@ class AutofillDriver:
 
         if pid:
             self.set_state(self.state, f'Inserting "{image.name}"')
-            for slot in slots_to_fill:
-                # Insert the card into each slot and wait for the page to load before continuing
-                self.execute_javascript(
-                    f'PageLayout.prototype.applyDragPhoto({self.get_element_for_slot_js(slot)}, 0, "{pid}")'
-                )
-                self.wait()
+            # Insert the card into each slot in a single script, waiting in the browser for the page to load
+            # after each slot before continuing. The loading circle may not appear immediately after inserting,
+            # so a slot is only considered done once the loading circle has come and gone, or once it hasn't
+            # appeared within a short settle period. The script only completes once the page has loaded after the
+            # last slot, so there's no need to `wait` afterwards
+            error = self.execute_async_javascript(
+                IS_LOADING_JS
+                + """
+                var pid = arguments[0], slots = arguments[1], callback = arguments[arguments.length - 1];
+                var layout = PageLayout.prototype;
+                var settleMilliseconds = 250;
+                function insertIntoSlot(index) {
+                    try {
+                        if (index >= slots.length) {
+                            callback(null);
+                            return;
+                        }
+                        layout.applyDragPhoto(layout.getElement3("dnImg", String(slots[index])), 0, pid);
+                        waitForSlot(index, Date.now() + settleMilliseconds, false);
+                    } catch (e) {
+                        callback(String(e));
+                    }
+                }
+                function waitForSlot(index, settleDeadline, sawLoading) {
+                    if (isLoading()) {
+                        setTimeout(function () { waitForSlot(index, settleDeadline, true); }, 50);
+                    } else if (sawLoading || Date.now() > settleDeadline) {
+                        insertIntoSlot(index + 1);
+                    } else {
+                        setTimeout(function () { waitForSlot(index, settleDeadline, false); }, 50);
+                    }
+                }
+                (function waitForInitialLoad() {
+                    if (isLoading()) {
+                        setTimeout(waitForInitialLoad, 50);
+                    } else {
+                        insertIntoSlot(0);
+                    }
+                })();
+                """,
+                pid,
+                slots_to_fill,
+            )
+            if error is not None:
+                raise sl_exc.JavascriptException(error)
             self.set_state(self.state)
 
+    def insert_pending_image(self) -> None:
+        """
+        Inserts the most recently uploaded image into its slots if this hasn't happened yet.
+        """
+
+        if self.pending_insertion is not None:
+            pid, image = self.pending_insertion
+            self.pending_insertion = None
+            self.insert_image(pid, image)
+
     @exception_retry_skip_handler
     def upload_and_insert_image(self, image: CardImage) -> bool:
         """
@@ -353,20 +614,21 @@ class AutofillDriver:
         * None of the image's slots filled - upload the image and insert it into all slots
         * Some of the image's slots filled - fill the unfilled slots with the image in the first filled
         * All of the image's slots filled - no action required
+        Newly uploaded images are inserted while the next image uploads - see `insert_pending_image`.
         Returns whether any action to modify the targeted site's project state was taken.
         """
 
-        slots_filled = [self.is_slot_filled(slot) for slot in image.slots]
+        pids_in_slots = self.get_pids_in_slots(image.slots)
+        slots_filled = [pid is not None for pid in pids_in_slots]
         if all(slots_filled):
             return False
         elif not any(slots_filled):
             pid = self.upload_image(image)
-            self.insert_image(pid, image)
+            self.insert_pending_image()  # in case `image` didn't need to be uploaded
+            if pid:
+                self.pending_insertion = (pid, image)
         else:
-            idx = next(index for index, value in enumerate(slots_filled) if value is True)
-            pid = self.execute_javascript(
-                f'{self.get_element_for_slot_js(image.slots[idx])}.getAttribute("pid")', return_=True
-            )
+            pid = next(pid for pid in pids_in_slots if pid is not None)
             unfilled_slot_numbers = [image.slots[i] for i in range(len(image.slots)) if slots_filled[i] is False]
             self.insert_image(pid, image, slots=unfilled_slot_numbers)
         return True
@@ -374,17 +636,21 @@ class AutofillDriver:
     @exception_retry_skip_handler
     def upload_and_insert_images(self, images: CardImageCollection, auto_save_threshold: Optional[int]) -> None:
         image_count = len(images.cards)
-        for i in range(image_count):
-            image: CardImage = images.queue.get()
-            if image.downloaded:
-                project_mutated = self.upload_and_insert_image(image)
-                if (
-                    auto_save_threshold is not None
-                    and project_mutated
-                    and ((i % auto_save_threshold) == (auto_save_threshold - 1) or i == (image_count - 1))
-                ):
-                    self.save_project_to_user_account()
-            self.upload_bar.update()
+        # every element looked up while uploading and inserting is already on the page, so there's nothing to
+        # gain from waiting for elements to appear
+        with self.implicit_wait(0):
+            for i, image in enumerate(images.images_as_completed()):
+                if image.downloaded:
+                    project_mutated = self.upload_and_insert_image(image)
+                    if (
+                        auto_save_threshold is not None
+                        and project_mutated
+                        and ((i % auto_save_threshold) == (auto_save_threshold - 1) or i == (image_count - 1))
+                    ):
+                        self.insert_pending_image()
+                        self.save_project_to_user_account()
+                self.upload_bar.update()
+            self.insert_pending_image()
 
     # endregion
 
@@ -392,7 +658,7 @@ class AutofillDriver:
 
     @exception_retry_skip_handler
     def is_user_authenticated(self) -> bool:
-        return len(self.driver.find_elements(By.XPATH, f'//a[@href="{self.target_site.value.logout_url}"]')) == 1
+        return len(self.driver.find_elements(By.CSS_SELECTOR, f'a[href="{self.target_site.value.logout_url}"]')) == 1
 
     @exception_retry_skip_handler
     def authenticate(self) -> None:
@@ -418,32 +684,69 @@ class AutofillDriver:
     # region project management
 
     @exception_retry_skip_handler
-    def set_bracket(self, dropdown_id: str) -> None:
+    def get_dropdown_option_values(self, dropdown_id: str) -> list[str]:
+        return self.driver.execute_script(  # type: ignore
+            "return Array.from(document.getElementById(arguments[0]).options, function (o) { return o.value; });",
+            dropdown_id,
+        )
+
+    @exception_retry_skip_handler
+    def select_dropdown_options(self, selections: list[dict[str, str]]) -> None:
         """
-        Configure the project to fit into the smallest
+        Selects options in any number of dropdowns with a single script.
+        Each selection specifies the `id` of a dropdown and either the `text` or the `value` of the option to select.
+        """
+
+        self.driver.execute_script(  # type: ignore
+            """
+            arguments[0].forEach(function (selection) {
+                var dropdown = document.getElementById(selection.id);
+                var option = Array.from(dropdown.options).find(function (o) {
+                    return "text" in selection ? o.text.trim() === selection.text : o.value === selection.value;
+                });
+                if (option === undefined) {
+                    throw new Error("Cannot select " + JSON.stringify(selection) + " - no such option exists");
+                }
+                if (!option.selected) {
+                    option.selected = true;
+                    dropdown.dispatchEvent(new Event("input", {bubbles: true}));
+                    dropdown.dispatchEvent(new Event("change", {bubbles: true}));
+                }
+            });
+            """,
+            selections,
+        )
+
+    def get_bracket(self, dropdown_id: str) -> int:
+        """
+        Determine the smallest bracket offered in the dropdown `dropdown_id` which the project fits into.
 
         :raises: If the project size does not fit into any bracket
         """
 
-        qty_dropdown = Select(self.driver.find_element(by=By.ID, value=dropdown_id))
-        bracket_options = sorted(
-            [
-                option_value
-                for option in qty_dropdown.options
-                if (option_value := int(option.get_attribute("value"))) >= self.order.details.quantity
-            ]
-        )
+        brackets = sorted([int(value) for value in self.get_dropdown_option_values(dropdown_id)])
+        bracket_options = [bracket for bracket in brackets if bracket >= self.order.details.quantity]
         assert bracket_options, (
             f"Your project contains {bold(self.order.details.quantity)} cards - this does not fit into any bracket "
             f"that {bold(self.target_site.name)} offers! The brackets are: "
-            f"{', '.join([bold(option) for option in bracket_options])}"
+            f"{', '.join([bold(bracket) for bracket in brackets])}"
         )
         bracket = bracket_options[0]
         print(
             f"Configuring your project of {bold(self.order.details.quantity)} cards "
             f"in the bracket of up to {bold(bracket)} cards."
         )
-        qty_dropdown.select_by_value(str(bracket))
+        return bracket
+
+    @exception_retry_skip_handler
+    def set_bracket(self, dropdown_id: str) -> None:
+        """
+        Configure the project to fit into the smallest bracket it can.
+
+        :raises: If the project size does not fit into any bracket
+        """
+
+        self.select_dropdown_options([{"id": dropdown_id, "value": str(self.get_bracket(dropdown_id))}])
 
     @exception_retry_skip_handler
     def define_project(self) -> None:
@@ -453,21 +756,25 @@ class AutofillDriver:
         assert (
             stock_to_select
         ), f"Cardstock {bold(self.order.details.stock)} is not supported by {bold(self.target_site.name)}!"
-        stock_dropdown = Select(
-            self.driver.find_element(by=By.ID, value=self.target_site.value.cardstock_dropdown_element_id)
+        self.select_dropdown_options(
+            [{"id": self.target_site.value.cardstock_dropdown_element_id, "text": stock_to_select}]
         )
-        stock_dropdown.select_by_visible_text(stock_to_select)
+        # the targeted site may update the other dropdowns in response to the selected cardstock
+        self.wait()
 
         # Select number of cards
-        self.set_bracket(dropdown_id=self.target_site.value.quantity_dropdown_element_id)
+        quantity_dropdown_id = self.target_site.value.quantity_dropdown_element_id
+        selections = [{"id": quantity_dropdown_id, "value": str(self.get_bracket(quantity_dropdown_id))}]
 
         # Switch the finish to foil if the user ordered foil cards
         if self.order.details.foil:
             if self.target_site.value.supports_foil:
-                foil_dropdown = Select(
-                    self.driver.find_element(by=By.ID, value=self.target_site.value.print_type_dropdown_element_id)
+                selections.append(
+                    {
+                        "id": self.target_site.value.print_type_dropdown_element_id,
+                        "value": self.target_site.value.foil_dropdown_element_value,
+                    }
                 )
-                foil_dropdown.select_by_value(self.target_site.value.foil_dropdown_element_value)
             else:
                 print(
                     textwrap.dedent(
@@ -479,6 +786,7 @@ class AutofillDriver:
                     )
                 )
 
+        self.select_dropdown_options(selections)
         self.set_state(States.paging_to_fronts)
 
     @alert_handler
@@ -547,19 +855,21 @@ class AutofillDriver:
     def page_to_fronts(self) -> None:
         self.assert_state(States.paging_to_fronts)
 
-        # reset this between fronts and backs
-        self.file_path_to_pid_map = {}
+        # reset these between fronts and backs
+        self.file_hash_to_pid_map = {}
+        self.upload_input = None
 
         # Accept current settings and move to next step
         self.wait_until_javascript_object_is_defined("doPersonalize")
         self.execute_javascript(f"doPersonalize('{self.target_site.value.accept_settings_url}');")
 
         # Set the desired number of cards, then move to the next step
-        with self.switch_to_frame("sysifm_loginFrame"):
-            qty = self.driver.find_element(by=By.ID, value="txt_card_number")
-            qty.clear()
-            qty.send_keys(str(self.order.details.quantity))
-            self.different_images()
+        if not self.set_mode_in_frame(same_images=False, quantity=self.order.details.quantity):
+            with self.switch_to_frame("sysifm_loginFrame"):
+                qty = self.driver.find_element(by=By.ID, value="txt_card_number")
+                qty.clear()
+                qty.send_keys(str(self.order.details.quantity))
+                self.different_images()
 
         self.set_state(States.inserting_fronts)
 
@@ -578,15 +888,16 @@ class AutofillDriver:
     def page_to_backs(self, skip_setup: bool) -> None:
         self.assert_state(States.paging_to_backs)
 
-        # reset this between fronts and backs
-        self.file_path_to_pid_map = {}
+        # reset these between fronts and backs
+        self.file_hash_to_pid_map = {}
+        self.upload_input = None
 
         self.next_step()
         self.wait()
-        try:
-            self.driver.find_element(by=By.ID, value="closeBtn").click()
-        except NoSuchElementException:
-            pass
+        # close the dialogue if it's present - checking in JavaScript means we don't wait for it to appear if not
+        self.execute_javascript(
+            "var closeButton = document.getElementById('closeBtn'); if (closeButton !== null) closeButton.click();"
+        )
         self.next_step()
 
         if skip_setup:
@@ -597,16 +908,17 @@ class AutofillDriver:
                 self.execute_javascript("PageLayout.prototype.renderDesignCount()")
             except sl_exc.JavascriptException:  # the dialogue has already been brought up if the above line failed
                 pass
-        with self.switch_to_frame("sysifm_loginFrame"):
-            try:
-                if len(self.order.backs.cards) == 1:
-                    # Same cardback for every card
-                    self.same_images()
-                else:
-                    # Different cardbacks
-                    self.different_images()
-            except NoSuchWindowException:  # TODO: investigate exactly why this happens under --skipsetup. too tired atm
-                pass
+        # Same cardback for every card, or different cardbacks
+        same_images = len(self.order.backs.cards) == 1
+        if not self.set_mode_in_frame(same_images=same_images):
+            with self.switch_to_frame("sysifm_loginFrame"):
+                try:
+                    if same_images:
+                        self.same_images()
+                    else:
+                        self.different_images()
+                except NoSuchWindowException:  # TODO: investigate exactly why this happens under --skipsetup
+                    pass
         self.set_state(States.inserting_backs)
 
     def insert_backs(self, auto_save_threshold: Optional[int]) -> None:
@@ -645,6 +957,12 @@ class AutofillDriver:
             self.order.backs.download_images(
                 pool=pool, download_bar=self.download_bar, post_processing_config=post_processing_config
             )
+            try:
+                self.open_target_site()
+            except Exception:
+                # report that the browser couldn't be started now rather than after every image has downloaded
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
             if any([skip_setup is True, auto_save_threshold is not None]):
                 self.authenticate()
 
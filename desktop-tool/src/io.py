@@ -1,6 +1,8 @@
 import base64
+import hashlib
 import os
 import sys
+import threading
 from typing import Any, Optional
 
 import ratelimit
@@ -11,13 +13,27 @@ from src.processing import ImagePostProcessingConfig, post_process_image
 
 # region network IO
 
+thread_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Retrieve the calling thread's session, creating it if necessary.
+    Reusing a session keeps connections to the Google Scripts API alive between requests,
+    rather than negotiating a new connection for each image.
+    """
+
+    if not hasattr(thread_local, "session"):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
 
 @ratelimit.sleep_and_retry  # type: ignore  # `ratelimit` does not implement decorator typing correctly
 @ratelimit.limits(calls=1, period=0.1)  # type: ignore  # `ratelimit` does not implement decorator typing correctly
 def rate_limit_api_call(
     url: str, method: str, data: dict[str, Any], params: dict[str, Any], timeout: Optional[int] = None
 ) -> requests.Response:
-    with requests.request(url=url, method=method, data=data, params=params, timeout=timeout) as r_info:
+    with get_session().request(url=url, method=method, data=data, params=params, timeout=timeout) as r_info:
         return r_info
 
 
@@ -103,6 +119,18 @@ def file_exists(file_path: Optional[str]) -> bool:
     return file_path is not None and file_path != "" and os.path.isfile(file_path) and os.path.getsize(file_path) > 0
 
 
+def get_file_hash(file_path: str) -> str:
+    """
+    Hashes the contents of the file at `file_path` so that identical files can be identified.
+    """
+
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
 def remove_directories(directory_list: list[str]) -> None:
     for directory in directory_list:
         try:
@@ -1,9 +1,9 @@
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from glob import glob
-from queue import Queue
-from typing import Optional
+from typing import Generator, Optional
 from xml.etree.ElementTree import Element, ParseError
 
 import attr
@@ -18,12 +18,16 @@ from src.io import (
     CURRDIR,
     download_google_drive_file,
     file_exists,
+    get_file_hash,
     get_google_drive_file_name,
     image_directory,
 )
 from src.processing import ImagePostProcessingConfig
 from src.utils import bold, text_to_list, unpack_element
 
+# images are downloaded by a thread pool, and enlighten's counters are not safe to update from multiple threads
+progress_bar_lock = threading.Lock()
+
 
 @attr.s
 class CardImage:
@@ -36,6 +40,7 @@ class CardImage:
     downloaded: bool = attr.ib(init=False, default=False)
     uploaded: bool = attr.ib(init=False, default=False)
     errored: bool = attr.ib(init=False, default=False)
+    file_hash: Optional[str] = attr.ib(init=False, default=None)  # identifies duplicate images once downloaded
 
     # region file system interactions
 
@@ -126,18 +131,16 @@ class CardImage:
         return card_image
 
     def download_image(
-        self,
-        queue: Queue["CardImage"],
-        download_bar: enlighten.Counter,
-        post_processing_config: Optional[ImagePostProcessingConfig],
-    ) -> None:
+        self, download_bar: enlighten.Counter, post_processing_config: Optional[ImagePostProcessingConfig]
+    ) -> "CardImage":
         try:
             if not self.file_exists() and not self.errored and self.file_path is not None:
                 self.errored = not download_google_drive_file(
                     drive_id=self.drive_id, file_path=self.file_path, post_processing_config=post_processing_config
                 )
 
-            if self.file_exists() and not self.errored:
+            if self.file_path is not None and self.file_exists() and not self.errored:
+                self.file_hash = get_file_hash(self.file_path)
                 self.downloaded = True
             else:
                 print(
@@ -145,15 +148,16 @@ class CardImage:
                     f"Download link - {bold(f'https://drive.google.com/uc?id={self.drive_id}&export=download')}\n"
                 )
         except Exception as e:
-            # note: python threads die silently if they encounter an exception. if an exception does occur,
-            # log it, but still put the card onto the queue so the main thread doesn't spin its wheels forever waiting.
+            # note: an exception raised here would only surface when the main thread retrieves this download's result.
+            # if an exception does occur, log it, but still return the card so the main thread can continue.
             print(
                 f"An uncaught exception occurred when attempting to download '{bold(self.name)}':\n{bold(e)}\n"
                 f"Download link - {bold(f'https://drive.google.com/uc?id={self.drive_id}&export=download')}\n"
             )
         finally:
-            queue.put(self)
-            download_bar.update()
+            with progress_bar_lock:
+                download_bar.update()
+        return self
 
     # endregion
 
@@ -165,7 +169,7 @@ class CardImageCollection:
     """
 
     cards: list[CardImage] = attr.ib(default=[])
-    queue: Queue[CardImage] = attr.ib(init=False, default=attr.Factory(Queue))
+    downloads: list[Future[CardImage]] = attr.ib(init=False, default=attr.Factory(list))
     num_slots: int = attr.ib(default=0)
     face: constants.Faces = attr.ib(default=constants.Faces.front)
 
@@ -227,7 +231,18 @@ class CardImageCollection:
         bar with each image. Async function.
         """
 
-        pool.map(lambda x: x.download_image(self.queue, download_bar, post_processing_config), self.cards)
+        self.downloads = [pool.submit(x.download_image, download_bar, post_processing_config) for x in self.cards]
+
+    def images_as_completed(self) -> Generator[CardImage, None, None]:
+        """
+        Yields this collection's images as their downloads complete.
+        Images whose downloads complete at the same time are yielded in the order of their slots.
+        """
+
+        remaining = set(self.downloads)
+        while remaining:
+            completed, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+            yield from sorted((x.result() for x in completed), key=lambda x: min(x.slots, default=0))
 
     # endregion
 
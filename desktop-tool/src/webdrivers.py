@@ -1,3 +1,4 @@
+import os
 import sys
 from typing import Optional
 
@@ -8,32 +9,38 @@ from selenium.webdriver.chromium.webdriver import ChromiumDriver
 from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 
+# Selenium Manager resolves a webdriver for the browser each time the tool starts, and checks online for new driver
+# versions once its cached metadata is older than an hour. Reuse the cached metadata for 30 days instead.
+os.environ.setdefault("SE_TTL", str(30 * 24 * 60 * 60))
+
+
+def configure_chromium_options(options: ChromiumOptions, headless: bool) -> None:
+    """
+    Applies the options shared between all Chromium-based browsers to `options`.
+    """
 
-def get_chrome_driver(headless: bool = False, binary_location: Optional[str] = None) -> Chrome:
-    options = ChromeOptions()
     options.add_argument("--no-sandbox")
     options.add_argument("--log-level=3")
     options.add_argument("--disable-dev-shm-usage")
     if headless:
         options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")  # nothing is displayed, so skip GPU compositing
     options.add_experimental_option("excludeSwitches", ["enable-logging"])
     options.add_experimental_option("detach", True)
+
+
+def get_chrome_driver(headless: bool = False, binary_location: Optional[str] = None) -> Chrome:
+    options = ChromeOptions()
+    configure_chromium_options(options, headless=headless)
     if binary_location is not None:
         options.binary_location = binary_location
     driver = Chrome(options=options)
-    driver.set_network_conditions(offline=False, latency=5, throughput=5 * 125000)
     return driver
 
 
 def get_brave_driver(headless: bool = False, binary_location: Optional[str] = None) -> Chrome:
     options = ChromeOptions()
-    options.add_argument("--no-sandbox")
-    options.add_argument("--log-level=3")
-    options.add_argument("--disable-dev-shm-usage")
-    if headless:
-        options.add_argument("--headless=new")
-    options.add_experimental_option("excludeSwitches", ["enable-logging"])
-    options.add_experimental_option("detach", True)
+    configure_chromium_options(options, headless=headless)
 
     # the binary location for brave must be manually specified (otherwise chrome will open instead)
     if binary_location is not None:
@@ -51,23 +58,15 @@ def get_brave_driver(headless: bool = False, binary_location: Optional[str] = No
         options.binary_location = default_binary_locations[sys.platform]
 
     driver = Chrome(options=options)
-    driver.set_network_conditions(offline=False, latency=5, throughput=5 * 125000)
     return driver
 
 
 def get_edge_driver(headless: bool = False, binary_location: Optional[str] = None) -> ChromiumDriver:
     options: ChromiumOptions = EdgeOptions()
-    options.add_argument("--no-sandbox")
-    options.add_argument("--log-level=3")
-    options.add_argument("--disable-dev-shm-usage")
-    if headless:
-        options.add_argument("--headless=new")
-    options.add_experimental_option("excludeSwitches", ["enable-logging"])
-    options.add_experimental_option("detach", True)
+    configure_chromium_options(options, headless=headless)
     if binary_location is not None:
         options.binary_location = binary_location
     driver: ChromiumDriver = Edge(options=options)  # type: ignore
-    driver.set_network_conditions(offline=False, latency=5, throughput=5 * 125000)
     return driver
 
 
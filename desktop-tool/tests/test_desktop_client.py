@@ -2,12 +2,12 @@ import os
 import textwrap
 import time
 from concurrent.futures import ThreadPoolExecutor
-from queue import Queue
 from typing import Generator
 from xml.etree import ElementTree
 
 import pytest
 from enlighten import Counter
+from selenium.common import exceptions as sl_exc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
@@ -15,7 +15,12 @@ from selenium.webdriver.support.wait import WebDriverWait
 import src.constants as constants
 import src.utils
 from src.driver import AutofillDriver
-from src.io import get_google_drive_file_name, remove_directories, remove_files
+from src.io import (
+    get_file_hash,
+    get_google_drive_file_name,
+    remove_directories,
+    remove_files,
+)
 from src.order import CardImage, CardImageCollection, CardOrder, Details
 from src.pdf_maker import PdfExporter
 from src.processing import ImagePostProcessingConfig
@@ -84,11 +89,6 @@ def monkeypatch_current_working_directory(request, monkeypatch) -> None:
     monkeypatch.chdir(FILE_PATH)
 
 
-@pytest.fixture()
-def queue():
-    yield Queue()
-
-
 @pytest.fixture()
 def counter():
     yield Counter()
@@ -513,23 +513,24 @@ def test_card_image_drive_id_file_exists(image_local_file: CardImage):
     assert image_local_file.file_exists()
 
 
-def test_download_google_drive_image_default_post_processing(
-    image_valid_google_drive: CardImage, counter: Counter, queue: Queue[CardImage]
-):
-    image_valid_google_drive.download_image(
-        download_bar=counter, queue=queue, post_processing_config=DEFAULT_POST_PROCESSING
-    )
+def test_card_image_local_file_hash(image_local_file: CardImage, counter: Counter):
+    assert image_local_file.file_hash is None
+    image_local_file.download_image(download_bar=counter, post_processing_config=None)
+    assert image_local_file.downloaded is True
+    assert image_local_file.file_hash == get_file_hash(image_local_file.file_path)
+    assert image_local_file.file_hash != get_file_hash(f"{FILE_PATH}/cards/{SIMPLE_LOTUS}.png")
+
+
+def test_download_google_drive_image_default_post_processing(image_valid_google_drive: CardImage, counter: Counter):
+    image_valid_google_drive.download_image(download_bar=counter, post_processing_config=DEFAULT_POST_PROCESSING)
     assert image_valid_google_drive.file_exists() is True
     assert image_valid_google_drive.errored is False
     assert_file_size(image_valid_google_drive.file_path, 152990)
 
 
-def test_download_google_drive_image_downscaled(
-    image_valid_google_drive: CardImage, counter: Counter, queue: Queue[CardImage]
-):
+def test_download_google_drive_image_downscaled(image_valid_google_drive: CardImage, counter: Counter):
     image_valid_google_drive.download_image(
         download_bar=counter,
-        queue=queue,
         post_processing_config=ImagePostProcessingConfig(
             max_dpi=100, downscale_alg=constants.ImageResizeMethods.LANCZOS
         ),
@@ -539,27 +540,23 @@ def test_download_google_drive_image_downscaled(
     assert_file_size(image_valid_google_drive.file_path, 51123)
 
 
-def test_download_google_drive_image_no_post_processing(
-    image_valid_google_drive: CardImage, counter: Counter, queue: Queue[CardImage]
-):
-    image_valid_google_drive.download_image(download_bar=counter, queue=queue, post_processing_config=None)
+def test_download_google_drive_image_no_post_processing(image_valid_google_drive: CardImage, counter: Counter):
+    image_valid_google_drive.download_image(download_bar=counter, post_processing_config=None)
     assert image_valid_google_drive.file_exists() is True
     assert image_valid_google_drive.errored is False
     assert_file_size(image_valid_google_drive.file_path, 155686)
 
 
-def test_invalid_google_drive_image(image_invalid_google_drive: CardImage, counter: Counter, queue: Queue[CardImage]):
-    image_invalid_google_drive.download_image(
-        download_bar=counter, queue=queue, post_processing_config=DEFAULT_POST_PROCESSING
-    )
+def test_invalid_google_drive_image(image_invalid_google_drive: CardImage, counter: Counter):
+    image_invalid_google_drive.download_image(download_bar=counter, post_processing_config=DEFAULT_POST_PROCESSING)
     assert image_invalid_google_drive.errored is True
 
 
-def test_retrieve_card_name_and_download_file(image_google_valid_drive_no_name, counter, queue):
+def test_retrieve_card_name_and_download_file(image_google_valid_drive_no_name, counter):
     assert image_google_valid_drive_no_name.name == f"{SIMPLE_CUBE}.png"
     assert not image_google_valid_drive_no_name.file_exists()
     image_google_valid_drive_no_name.download_image(
-        download_bar=counter, queue=queue, post_processing_config=DEFAULT_POST_PROCESSING
+        download_bar=counter, post_processing_config=DEFAULT_POST_PROCESSING
     )
     assert image_google_valid_drive_no_name.file_exists()
 
@@ -588,6 +585,8 @@ def test_card_image_collection_download(card_image_collection_valid, counter, im
     time.sleep(3)
     pool.shutdown(wait=True, cancel_futures=False)
     assert all([x.file_exists() for x in card_image_collection_valid.cards])
+    # all downloads have completed, so images should be yielded in slot order
+    assert [x.slots for x in card_image_collection_valid.images_as_completed()] == [[0], [1, 2]]
 
 
 def test_card_image_collection_no_cards(input_enter, card_image_collection_element_no_cards):
@@ -857,6 +856,129 @@ def test_pdf_export_complete_separate_faces(monkeypatch, card_order_valid):
 # region test driver.py
 
 
+class ScriptDriver:
+    """
+    Stands in for a WebDriver. Each script raises the next of `outcomes` if it's an exception,
+    or returns it otherwise. The arguments each script was executed with are recorded in `script_args`.
+    """
+
+    def __init__(self, outcomes: list) -> None:
+        self.outcomes = outcomes
+        self.scripts_executed = 0
+        self.script_args = []
+
+    @property
+    def switch_to(self):
+        raise sl_exc.NoAlertPresentException()
+
+    def execute_script(self, script, *args):
+        return self.execute_async_script(script, *args)
+
+    def execute_async_script(self, script, *args):
+        self.scripts_executed += 1
+        self.script_args.append(args)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture()
+def autofill_driver_without_browser(card_order_valid) -> Generator[AutofillDriver, None, None]:
+    yield AutofillDriver(order=card_order_valid)
+
+
+def test_execute_cancels_downloads_if_browser_cannot_start(monkeypatch, autofill_driver_without_browser):
+    downloads_started = []
+
+    def download_image(self, download_bar, post_processing_config):
+        downloads_started.append(self)
+        time.sleep(1)
+        return self
+
+    def initialise_driver(self):
+        raise Exception("Browser not installed")
+
+    monkeypatch.setattr("src.driver.THREADS", 1)
+    monkeypatch.setattr(CardImage, "download_image", download_image)
+    monkeypatch.setattr(AutofillDriver, "initialise_driver", initialise_driver)
+    with pytest.raises(Exception, match="Browser not installed"):
+        autofill_driver_without_browser.execute(skip_setup=False, auto_save_threshold=None, post_processing_config=None)
+    # only the download which was already in progress should have run
+    assert len(downloads_started) <= 1
+
+
+def test_wait_for_uploaded_image_pids_continues_after_timeout(autofill_driver_without_browser):
+    autofill_driver_without_browser.driver = ScriptDriver([sl_exc.TimeoutException(), {"pids": "pid1;pid2"}])
+    assert autofill_driver_without_browser.wait_for_uploaded_image_pids() == ["pid1", "pid2"]
+    assert autofill_driver_without_browser.driver.scripts_executed == 2
+
+
+def test_wait_for_uploaded_image_pids_no_images(autofill_driver_without_browser):
+    autofill_driver_without_browser.driver = ScriptDriver([{"pids": ""}])
+    assert autofill_driver_without_browser.wait_for_uploaded_image_pids() == []
+
+
+def test_wait_for_uploaded_image_pids_prompts_user_if_site_not_loaded(monkeypatch, autofill_driver_without_browser):
+    class SkipPrompt:
+        def execute(self):
+            return "Skip this action"
+
+    monkeypatch.setattr(src.utils.inquirer, "select", lambda **kwargs: SkipPrompt())
+    autofill_driver_without_browser.driver = ScriptDriver([{"error": "oDesignImage is not defined"}])
+    assert autofill_driver_without_browser.wait_for_uploaded_image_pids() is None
+    assert autofill_driver_without_browser.driver.scripts_executed == 1
+
+
+def test_upload_image_fetches_uploaded_images_once_before_uploading(
+    monkeypatch, autofill_driver_without_browser, image_local_file
+):
+    monkeypatch.setattr(AutofillDriver, "send_file_to_upload_input", lambda self, file_path: None)
+    autofill_driver_without_browser.driver = ScriptDriver([{"pids": "pid1"}, None, {"pids": "pid1;pid2"}])
+    assert autofill_driver_without_browser.upload_image(image_local_file) == "pid2"
+    # the existing images, the upload starting, and the upload finishing
+    assert autofill_driver_without_browser.driver.scripts_executed == 3
+
+
+def test_wait_continues_after_timeout(autofill_driver_without_browser):
+    autofill_driver_without_browser.driver = ScriptDriver([sl_exc.TimeoutException(), None])
+    autofill_driver_without_browser.wait()
+    assert autofill_driver_without_browser.driver.scripts_executed == 2
+
+
+@pytest.mark.parametrize("exception", [sl_exc.WebDriverException("document unloaded"), sl_exc.NoSuchFrameException()])
+def test_wait_returns_on_webdriver_exception(autofill_driver_without_browser, exception):
+    autofill_driver_without_browser.driver = ScriptDriver([exception])
+    autofill_driver_without_browser.wait()
+    assert autofill_driver_without_browser.driver.scripts_executed == 1
+
+
+def test_define_project_selects_cardstock_before_reading_brackets(autofill_driver_without_browser):
+    autofill_driver_without_browser.order.details.foil = True
+    autofill_driver_without_browser.state = constants.States.defining_order
+    autofill_driver_without_browser.driver = ScriptDriver([None, None, ["18", "36", "55"], None])
+    autofill_driver_without_browser.define_project()
+    site = constants.TargetSites.MakePlayingCards.value
+    assert autofill_driver_without_browser.driver.script_args == [
+        (
+            [
+                {
+                    "id": site.cardstock_dropdown_element_id,
+                    "text": site.cardstock_site_name_mapping[constants.Cardstocks.S30],
+                }
+            ],
+        ),
+        (),  # wait for the site to respond to the selected cardstock
+        (site.quantity_dropdown_element_id,),
+        (
+            [
+                {"id": site.quantity_dropdown_element_id, "value": "18"},
+                {"id": site.print_type_dropdown_element_id, "value": site.foil_dropdown_element_value},
+            ],
+        ),
+    ]
+
+
 @pytest.mark.flaky(retries=3, delay=1)
 @pytest.mark.parametrize("browser", [constants.Browsers.chrome, constants.Browsers.edge])
 @pytest.mark.parametrize(